@@ -0,0 +1,85 @@
+from hashlib import sha256
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+
+TOKEN_KEY = 'auth:token:user:{}'
+# Поля пользователя, которые читают представления. Пароль и счётчики
+# в кеш не попадают.
+USER_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'avatar',
+    'is_active', 'is_staff', 'is_superuser',
+)
+
+
+def token_cache_key(key):
+    return TOKEN_KEY.format(sha256(key.encode()).hexdigest())
+
+
+def forget_token(key):
+    cache.delete(token_cache_key(key))
+
+
+def get_user_snapshot(user):
+    return {
+        name: user._meta.get_field(name).get_prep_value(getattr(user, name))
+        for name in USER_FIELDS
+    }
+
+
+def get_user_from_snapshot(snapshot):
+    """Пользователь из снимка; остальные поля отложены и при обращении
+    читаются из базы, а save() записывает только поля снимка."""
+    User = get_user_model()
+    names = [
+        field.attname for field in User._meta.concrete_fields
+        if field.attname in snapshot
+    ]
+    return User.from_db(
+        router.db_for_read(User), names, [snapshot[name] for name in names]
+    )
+
+
+def cache_is_shared():
+    """Кеш общий для воркеров, а не LocMemCache процесса."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену с кешированием пользователя.
+
+    Для безопасных запросов снимок пользователя (USER_FIELDS) берётся
+    из кеша на AUTH_TOKEN_CACHE_TIMEOUT секунд. Запись сбрасывается
+    при удалении токена и при сохранении пользователя (api.signals).
+    Изменяющие запросы читают пользователя из базы, чтобы не сохранить
+    устаревшую копию поверх счётчиков.
+
+    С LocMemCache кеш не используется: запись удалялась бы только в
+    воркере, обработавшем выход, а в остальных токен продолжал бы
+    действовать до истечения таймаута.
+    """
+
+    def authenticate(self, request):
+        self.use_cache = request.method in SAFE_METHODS and cache_is_shared()
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        if not self.use_cache:
+            return super().authenticate_credentials(key)
+
+        cache_key = token_cache_key(key)
+        snapshot = cache.get(cache_key)
+        if snapshot is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(
+                cache_key, get_user_snapshot(user),
+                settings.AUTH_TOKEN_CACHE_TIMEOUT,
+            )
+            return user, token
+        user = get_user_from_snapshot(snapshot)
+        return user, self.get_model()(key=key, user=user)
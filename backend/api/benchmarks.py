@@ -0,0 +1,108 @@
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.counters import recipe_counters
+from recipes.models import Favorite, Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import Subscribe
+
+User = get_user_model()
+
+PASSWORD = 'pass-12345'
+
+
+@contextmanager
+def temporary_database():
+    """Пустая база для замеров, как у тестов; удаляется после них.
+
+    Счётчики просмотров и переходов не пишутся: фоновый поток буфера
+    держал бы соединение с временной базой.
+    """
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    cache.clear()
+    try:
+        with mock.patch.object(recipe_counters, 'add'):
+            yield
+    finally:
+        cache.clear()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def create_user(username, first_name, **fields):
+    """Пользователь username@example.com с паролем PASSWORD."""
+    return User.objects.create_user(
+        email=f'{username}@example.com', username=username,
+        first_name=first_name, last_name='Рецептов', password=PASSWORD,
+        **fields,
+    )
+
+
+def create_recipes(author, count, tags, ingredients):
+    """count рецептов автора с тегами tags и ингредиентами ingredients.
+
+    Возвращает все рецепты автора по возрастанию pk.
+    """
+    Recipe.objects.bulk_create(
+        Recipe(
+            name=f'Рецепт {number}',
+            description='Описание рецепта. ' * 20,
+            cooking_time=10 + number % 50,
+            image='recipes/recipe.png',
+            author=author,
+        )
+        for number in range(count)
+    )
+    recipes = list(Recipe.objects.filter(author=author).order_by('pk'))
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipes for tag in tags
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=5)
+        for recipe in recipes for ingredient in ingredients
+    )
+    return recipes
+
+
+def create_bench_data(count, tags=3, ingredients=5):
+    """Автор, подписанный на него читатель и count рецептов автора.
+
+    Возвращает (author, reader, recipes); половина рецептов в избранном
+    читателя.
+    """
+    author = create_user('author', 'Автор', avatar='users/avatar.png')
+    reader = create_user('reader', 'Читатель')
+    Subscribe.objects.create(user=reader, subscribed_user=author)
+    Tag.objects.bulk_create(
+        Tag(name=f'Тег {number}', slug=f'tag{number}')
+        for number in range(tags)
+    )
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+        for number in range(ingredients)
+    )
+    recipes = create_recipes(
+        author, count, Tag.objects.all(), Ingredient.objects.all()
+    )
+    Favorite.objects.bulk_create(
+        Favorite(user=reader, recipe=recipe) for recipe in recipes[::2]
+    )
+    return author, reader, recipes
+
+
+def measure(function, repeat):
+    """Среднее время одного вызова function в секундах."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
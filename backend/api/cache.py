@@ -0,0 +1,111 @@
+import time
+from collections import OrderedDict
+from functools import partial
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+MODEL_VERSION_KEY = 'version:{}'
+USER_VERSION_KEY = 'version:user:{}'
+SHORT_LINK_KEY = 'short_link:{}'
+
+
+def model_version_key(model):
+    return MODEL_VERSION_KEY.format(model._meta.label_lower)
+
+
+def user_version_key(user_id):
+    """Версия данных, зависящих от пользователя: избранного и подписок."""
+    return USER_VERSION_KEY.format(user_id)
+
+
+def get_versions(keys):
+    """Версии для ключей кеша и валидаторов условных запросов.
+
+    Версия — время последнего изменения в наносекундах, поэтому она же
+    служит значением Last-Modified. Отсутствующая версия (новый или
+    вытесненный ключ) считается изменённой сейчас.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(key):
+    cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_version_on_commit(key):
+    """Меняет версию после фиксации текущей транзакции.
+
+    Иначе чтение между сменой версии и фиксацией сохранило бы в кеше
+    старые данные под новой версией.
+    """
+    transaction.on_commit(partial(bump_version, key))
+
+
+class LRUCache:
+    """Кеш в памяти процесса с ограничением размера и временем жизни."""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.lock = Lock()
+        self.data = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + self.timeout)
+            self.data.move_to_end(key)
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+
+short_links = LRUCache(
+    settings.SHORT_LINK_CACHE_SIZE, settings.SHORT_LINK_CACHE_TIMEOUT
+)
+
+
+def get_short_link_target(code, load):
+    """id рецепта по короткому коду.
+
+    Ищется в памяти воркера, затем в общем кеше, затем вызывается
+    load(code). Отсутствующие рецепты не кешируются.
+    """
+    recipe_id = short_links.get(code)
+    if recipe_id is None:
+        key = SHORT_LINK_KEY.format(code)
+        recipe_id = cache.get(key)
+        if recipe_id is None:
+            recipe_id = load(code)
+            if recipe_id is None:
+                return None
+            cache.set(key, recipe_id, settings.SHORT_LINK_CACHE_TIMEOUT)
+        short_links.set(code, recipe_id)
+    return recipe_id
+
+
+def forget_short_link(code):
+    short_links.delete(code)
+    cache.delete(SHORT_LINK_KEY.format(code))
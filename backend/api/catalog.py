@@ -0,0 +1,65 @@
+import json
+from bisect import bisect_left
+from threading import Lock
+
+from api.cache import get_versions, model_version_key
+from recipes.models import Ingredient
+
+
+class IngredientCatalog:
+    """Каталог ингредиентов в памяти воркера.
+
+    Хранит готовый JSON всего каталога и отсортированный по приведённому
+    к нижнему регистру названию массив для поиска по префиксу бинарным
+    поиском. Перезагружается, когда меняется версия модели Ingredient.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.version = None
+        self.catalog = b'[]'
+        self.keys = []
+        self.items = []
+
+    def search(self, prefix=''):
+        """JSON-массив ингредиентов, названия которых начинаются с prefix."""
+        self.refresh()
+        if not prefix:
+            return self.catalog
+        keys, items = self.keys, self.items
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + chr(0x10FFFF), start)
+        return b'[' + b','.join(items[start:end]) + b']'
+
+    def refresh(self):
+        version, = get_versions([model_version_key(Ingredient)])
+        if version == self.version:
+            return
+        with self.lock:
+            if version != self.version:
+                self.load()
+                self.version = version
+
+    def load(self):
+        entries = [
+            (name.casefold(), self.encode(pk, name, measurement_unit))
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        ]
+        self.catalog = b'[' + b','.join(item for _, item in entries) + b']'
+        entries.sort(key=lambda entry: entry[0])
+        self.keys = [key for key, _ in entries]
+        self.items = [item for _, item in entries]
+
+    @staticmethod
+    def encode(pk, name, measurement_unit):
+        return json.dumps(
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit},
+            ensure_ascii=False,
+            separators=(',', ':'),
+        ).encode()
+
+
+ingredient_catalog = IngredientCatalog()
@@ -1,5 +1,12 @@
+MAX_BULK_RECIPES = 100
 MAX_LENGTH_INGREDIENT_NAME = 128
 MAX_LENGTH_MEASUREMENT_UNIT = 64
 MAX_LENGTH_RECIPE_NAME = 256
 MAX_LENGTH_SHORT_LINK = 6
 MAX_LENGTH_TAG = 32
+MAX_PAGE_SIZE = 100
+# Единица измерения -> (базовая единица, множитель).
+UNIT_CONVERSIONS = {
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+}
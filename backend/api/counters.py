@@ -0,0 +1,86 @@
+import atexit
+import logging
+import os
+from collections import Counter, defaultdict
+from threading import Event, Lock, Thread
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import F
+
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    """Буфер приращений счётчиков модели в памяти процесса.
+
+    Приращения суммируются по записям и записываются фоновым потоком
+    раз в interval секунд или после max_size приращений запросами
+    UPDATE ... SET field = field + delta. Каждый воркер gunicorn копит
+    свои приращения, а сложение в базе атомарно, поэтому воркеры не
+    мешают друг другу. После fork буфер и поток создаются заново.
+    Приращения, которые не удалось записать из-за ошибки базы,
+    теряются: счётчики приблизительные.
+    """
+
+    def __init__(self, model, interval, max_size):
+        self.model = model
+        self.interval = interval
+        self.max_size = max_size
+        self.lock = Lock()
+        self.wakeup = Event()
+        self.counts = defaultdict(Counter)
+        self.size = 0
+        self.pid = None
+
+    def add(self, field, pk, delta=1):
+        self.ensure_started()
+        with self.lock:
+            self.counts[field][pk] += delta
+            self.size += 1
+            full = self.size >= self.max_size
+        if full:
+            self.wakeup.set()
+
+    def ensure_started(self):
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            # Приращения, унаследованные от родителя, запишет он сам.
+            self.counts = defaultdict(Counter)
+            self.size = 0
+            Thread(target=self.run, daemon=True).start()
+            atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, defaultdict(Counter)
+            self.size = 0
+        for field, deltas in counts.items():
+            pks_by_delta = defaultdict(list)
+            for pk, delta in deltas.items():
+                pks_by_delta[delta].append(pk)
+            try:
+                for delta, pks in pks_by_delta.items():
+                    self.model.objects.filter(pk__in=pks).update(
+                        **{field: F(field) + delta}
+                    )
+            except DatabaseError:
+                logger.exception('Failed to flush %s', field)
+
+
+recipe_counters = CounterBuffer(
+    Recipe, settings.COUNTERS_FLUSH_INTERVAL, settings.COUNTERS_BUFFER_SIZE
+)
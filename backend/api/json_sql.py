@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates.mixins import OrderableAggMixin
+from django.db.models import (Aggregate, Case, CharField, Exists, F, Func,
+                              OuterRef, Q, Subquery, TextField, Value, When)
+from django.db.models.functions import Cast, Coalesce, Concat
+
+from recipes.models import Recipe, RecipeIngredient
+from users.models import Subscribe
+
+
+class JSONBuildObject(Func):
+    """json_build_object: в отличие от jsonb сохраняет порядок ключей."""
+
+    function = 'JSON_BUILD_OBJECT'
+    output_field = TextField()
+
+    def __init__(self, **fields):
+        expressions = []
+        for key, value in fields.items():
+            expressions.extend((Value(key), value))
+        super().__init__(*expressions)
+
+
+class JSONAgg(OrderableAggMixin, Aggregate):
+    function = 'JSON_AGG'
+    template = '%(function)s(%(expressions)s %(ordering)s)'
+    output_field = TextField()
+
+
+def json_array(queryset, group_by, ordering, **fields):
+    """JSON-массив объектов из строк queryset, связанных с рецептом."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{group_by: OuterRef('pk')}).order_by()
+            .values(group_by).annotate(
+                items=JSONAgg(JSONBuildObject(**fields), ordering=ordering)
+            ).values('items')
+        ),
+        Value('[]'),
+        output_field=TextField(),
+    )
+
+
+def file_url(field, prefix):
+    """Абсолютный адрес файла или null, как у ImageField сериализатора."""
+    return Case(
+        When(Q(**{field: ''}) | Q(**{f'{field}__isnull': True}),
+             then=Value(None, output_field=CharField())),
+        default=Concat(Value(prefix), F(field)),
+        output_field=CharField(),
+    )
+
+
+def recipe_document(request):
+    """Выражение с JSON-документом рецепта в формате RecipeReadSerializer.
+
+    Работает только в Postgres. Рецепты должны быть аннотированы флагами
+    Recipe.objects.with_user_flags(user). Адреса файлов строятся как
+    MEDIA_URL + имя файла, то есть для FileSystemStorage.
+    """
+    media_prefix = request.build_absolute_uri(settings.MEDIA_URL)
+    user = request.user
+    if user.is_authenticated:
+        is_subscribed = Exists(Subscribe.objects.filter(
+            user=user, subscribed_user=OuterRef('author')
+        ))
+    else:
+        is_subscribed = Value(False)
+    return Cast(JSONBuildObject(
+        id=F('id'),
+        tags=json_array(
+            Recipe.tags.through.objects, 'recipe', ('tag__name',),
+            id=F('tag__id'), name=F('tag__name'), slug=F('tag__slug'),
+        ),
+        author=JSONBuildObject(
+            email=F('author__email'),
+            id=F('author__id'),
+            username=F('author__username'),
+            first_name=F('author__first_name'),
+            last_name=F('author__last_name'),
+            is_subscribed=is_subscribed,
+            avatar=file_url('author__avatar', media_prefix),
+        ),
+        ingredients=json_array(
+            RecipeIngredient.objects, 'recipe', ('id',),
+            id=F('ingredient__id'),
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+            amount=F('amount'),
+        ),
+        is_favorited=F('is_favorited'),
+        is_in_shopping_cart=F('is_in_shopping_cart'),
+        name=F('name'),
+        image=file_url('image', media_prefix),
+        text=F('description'),
+        cooking_time=F('cooking_time'),
+    ), TextField())
@@ -0,0 +1,60 @@
+import json
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.benchmarks import create_bench_data, measure, temporary_database
+from api.serializers import RecipeReadSerializer, RecipeSerializer
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare RecipeSerializer and RecipeReadSerializer time per recipe '
+        'in a temporary database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=100,
+            help='Number of recipes serialized per call.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Number of calls per measurement.',
+        )
+
+    def handle(self, *args, **kwargs):
+        with temporary_database():
+            _, reader, _ = create_bench_data(kwargs['recipes'])
+            for label, user in (
+                ('authenticated', reader), ('anonymous', AnonymousUser())
+            ):
+                self.compare(label, user, kwargs['repeat'])
+
+    def compare(self, label, user, repeat):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        recipes = list(Recipe.objects.with_related().with_user_flags(user))
+
+        def serialize(serializer_class):
+            return serializer_class(
+                recipes, many=True, context={'request': request}
+            ).data
+
+        same = json.dumps(serialize(RecipeSerializer)) == json.dumps(
+            serialize(RecipeReadSerializer)
+        )
+        slow, fast = (
+            measure(lambda: serialize(serializer_class), repeat)
+            / len(recipes) * 10 ** 6
+            for serializer_class in (RecipeSerializer, RecipeReadSerializer)
+        )
+        self.stdout.write(
+            f'{label:13} same output: {same}, '
+            f'RecipeSerializer {slow:.0f} us, '
+            f'RecipeReadSerializer {fast:.0f} us per recipe, '
+            f'x{slow / fast:.1f}'
+        )
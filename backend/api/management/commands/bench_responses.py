@@ -0,0 +1,80 @@
+import json
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.benchmarks import create_bench_data, measure, temporary_database
+from api.middleware import COMPRESSORS
+from api.renderers import ORJSONRenderer
+from recipes.models import Ingredient
+
+ENCODINGS = ('identity', 'gzip', 'br')
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure response size per Accept-Encoding and JSON render time '
+        'of the main endpoints in a temporary database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=50,
+            help='Number of recipes created for the measurement.',
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=2000,
+            help='Number of ingredients in the catalog.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=200,
+            help='Number of render calls per measurement.',
+        )
+
+    def handle(self, *args, **kwargs):
+        with temporary_database():
+            _, reader, recipes = create_bench_data(kwargs['recipes'])
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'Продукт {number}', measurement_unit='г')
+                for number in range(kwargs['ingredients'])
+            )
+            client = APIClient()
+            client.force_authenticate(reader)
+            self.stdout.write(
+                f'{"endpoint":28} {"raw":>8} {"gzip":>8} {"br":>8} '
+                f'{"json, us":>9} {"orjson, us":>11}'
+            )
+            for url in (
+                '/api/ingredients/',
+                '/api/recipes/',
+                f'/api/recipes/?limit={len(recipes)}',
+                f'/api/recipes/{recipes[0].pk}/',
+                '/api/users/',
+                '/api/tags/',
+            ):
+                self.measure_endpoint(client, url, kwargs['repeat'])
+
+    def measure_endpoint(self, client, url, repeat):
+        sizes = []
+        for encoding in ENCODINGS:
+            if encoding != 'identity' and encoding not in COMPRESSORS:
+                sizes.append('-')
+                continue
+            response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+            sizes.append(len(response.content))
+
+        response = client.get(url)
+        data = getattr(response, 'data', None)
+        if data is None:
+            data = json.loads(response.content)
+        times = [
+            measure(
+                lambda: renderer.render(data, 'application/json', {}), repeat
+            ) * 10 ** 6
+            for renderer in (JSONRenderer(), ORJSONRenderer())
+        ]
+        self.stdout.write(
+            f'{url:28} {sizes[0]:>8} {sizes[1]:>8} {sizes[2]:>8} '
+            f'{times[0]:>9.0f} {times[1]:>11.0f}'
+        )
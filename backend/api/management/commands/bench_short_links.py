@@ -0,0 +1,68 @@
+from django.contrib.sites.shortcuts import get_current_site
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.http import HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.test import RequestFactory
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+
+from api.benchmarks import create_bench_data, measure, temporary_database
+from api.cache import SHORT_LINK_KEY, short_links
+from api.views import redirect_short_link
+from recipes.models import Recipe
+from recipes.short_links import encode_short_link
+
+LEGACY_CODE = 'Ab3dE'
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def legacy_redirect_short_link(request, short_url):
+    """Прежнее представление: DRF и поиск рецепта на каждый запрос."""
+    recipe = get_object_or_404(Recipe, short_link=short_url)
+    host = get_current_site(request)
+    return HttpResponseRedirect(
+        f'http://{host.domain}/recipes/{recipe.id}/'
+    )
+
+
+class Command(BaseCommand):
+    help = 'Measure short link redirects per second in a temporary database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=2000,
+            help='Number of redirects per measurement.',
+        )
+
+    def handle(self, *args, **kwargs):
+        repeat = kwargs['requests']
+        with temporary_database():
+            _, _, recipes = create_bench_data(1)
+            Recipe.objects.filter(pk=recipes[0].pk).update(
+                short_link=LEGACY_CODE
+            )
+            code = encode_short_link(recipes[0].pk)
+            factory = RequestFactory()
+
+            def legacy():
+                legacy_redirect_short_link(
+                    factory.get(f'/s/{LEGACY_CODE}/'), short_url=LEGACY_CODE
+                )
+
+            def uncached():
+                short_links.delete(code)
+                cache.delete(SHORT_LINK_KEY.format(code))
+                cached()
+
+            def cached():
+                redirect_short_link(factory.get(f'/s/{code}/'), code)
+
+            for name, function in (
+                ('legacy api_view', legacy),
+                ('cache miss', uncached),
+                ('cache hit', cached),
+            ):
+                elapsed = measure(function, repeat)
+                self.stdout.write(f'{name:16} {1 / elapsed:8.0f} req/s')
@@ -1,19 +1,65 @@
+import csv
 import json
 import os
+import re
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from api.cache import bump_version, model_version_key
 from recipes.models import Ingredient
 
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_json(file, chunk_size=CHUNK_SIZE):
+    """Поэлементно разбирает JSON-массив объектов, не читая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON file must contain an array.')
+    position = 1
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise CommandError('Unexpected end of JSON file.')
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item['name'], item['measurement_unit']
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if row:
+            name, measurement_unit = row
+            yield name, measurement_unit
+
 
 class Command(BaseCommand):
-    help = 'Load ingredients from a JSON file'
+    help = 'Load ingredients from a JSON or CSV file'
+
+    readers = {'.json': iter_json, '.csv': iter_csv}
 
     def add_arguments(self, parser):
         parser.add_argument('file_path', type=str)
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Number of rows inserted by a single query.',
+        )
 
     def handle(self, *args, **kwargs):
         file_path = kwargs['file_path']
+        batch_size = kwargs['batch_size']
 
         if not os.path.isfile(file_path):
             self.stdout.write(
@@ -21,15 +67,30 @@ class Command(BaseCommand):
             )
             return
 
-        with open(file_path, 'r', encoding='utf-8') as file:
-            ingredients_data = json.load(file)
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension not in self.readers:
+            raise CommandError('Only .json and .csv files are supported.')
 
-        for ingredient in ingredients_data:
-            Ingredient.objects.create(
-                name=ingredient['name'],
-                measurement_unit=ingredient['measurement_unit']
-            )
+        started = time.monotonic()
+        total = 0
+        with open(file_path, 'r', encoding='utf-8') as file:
+            rows = self.readers[extension](file)
+            with transaction.atomic():
+                before = Ingredient.objects.count()
+                while batch := [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in islice(rows, batch_size)
+                ]:
+                    Ingredient.objects.bulk_create(
+                        batch, ignore_conflicts=True
+                    )
+                    total += len(batch)
+                created = Ingredient.objects.count() - before
+        bump_version(model_version_key(Ingredient))
 
+        elapsed = time.monotonic() - started
         self.stdout.write(self.style.SUCCESS(
-            'Ingredients loaded successfully!')
-        )
+            f'Ingredients loaded successfully! Read {total} rows, '
+            f'created {created} in {elapsed:.2f} s '
+            f'({total / elapsed if elapsed else total:.0f} rows/s).'
+        ))
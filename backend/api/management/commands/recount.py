@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from api.shopping_cart import rebuild_cart_totals
+from recipes.models import Favorite, Recipe, ShoppingList
+from users.models import Subscribe
+
+User = get_user_model()
+
+
+def count_subquery(model, field):
+    """Подзапрос с количеством строк model, ссылающихся на внешнюю запись."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(count=Count('pk')).values('count')
+        ),
+        Value(0),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalculate denormalized counters of users and recipes '
+        'and shopping cart totals'
+    )
+
+    counters = (
+        (User, 'recipes_count', Recipe, 'author'),
+        (User, 'followers_count', Subscribe, 'subscribed_user'),
+        (Recipe, 'favorites_count', Favorite, 'recipe'),
+        (Recipe, 'shopping_cart_count', ShoppingList, 'recipe'),
+    )
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            for model, counter, related_model, field in self.counters:
+                actual = count_subquery(related_model, field)
+                updated = model.objects.annotate(actual=actual).exclude(
+                    **{counter: actual}
+                ).values('pk')
+                count = model.objects.filter(pk__in=updated).update(
+                    **{counter: actual}
+                )
+                self.stdout.write(
+                    f'{model._meta.label}.{counter}: fixed {count} rows'
+                )
+            count = rebuild_cart_totals()
+            self.stdout.write(f'Shopping cart totals: rebuilt {count} rows')
+
+        self.stdout.write(self.style.SUCCESS('Counters recalculated!'))
@@ -0,0 +1,93 @@
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+REJECTED_ENCODING = re.compile(r';\s*q\s*=\s*0(\.0*)?\s*$')
+
+
+def get_accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме отклонённых через q=0."""
+    return {
+        item.split(';')[0].strip()
+        for item in header.lower().split(',')
+        if not REJECTED_ENCODING.search(item)
+    }
+
+
+def brotli_compress_string(content):
+    return brotli.compress(
+        content, quality=settings.COMPRESSION_BROTLI_QUALITY
+    )
+
+
+def brotli_compress_sequence(sequence):
+    compressor = brotli.Compressor(
+        quality=settings.COMPRESSION_BROTLI_QUALITY
+    )
+    for item in sequence:
+        data = compressor.process(item) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+COMPRESSORS = {'gzip': (compress_string, compress_sequence)}
+if brotli is not None:
+    COMPRESSORS['br'] = (brotli_compress_string, brotli_compress_sequence)
+ENCODINGS = ('br', 'gzip')
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжимает ответы brotli или gzip по заголовку Accept-Encoding.
+
+    Brotli выбирается, если он установлен и принимается клиентом.
+    Ответы короче COMPRESSION_MIN_SIZE байт не сжимаются.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if (
+            not response.streaming
+            and len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        accepted = get_accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        encoding = next(
+            (name for name in ENCODINGS
+             if name in accepted and name in COMPRESSORS),
+            None
+        )
+        if encoding is None:
+            return response
+        compress, compress_stream = COMPRESSORS[encoding]
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content
+            )
+            del response['Content-Length']
+        else:
+            content = compress(response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
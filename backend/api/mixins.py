@@ -0,0 +1,189 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from api.cache import get_versions, model_version_key, user_version_key
+
+
+def ordered_by(request, fields):
+    """Запрошена ли сортировка (параметр ordering) по одному из fields."""
+    ordering = request.query_params.get(api_settings.ORDERING_PARAM, '')
+    return any(
+        name.strip().lstrip('-') in fields for name in ordering.split(',')
+    )
+
+
+class AnonymousCacheMixin:
+    """Кеширование list и retrieve для анонимных пользователей.
+
+    Ключ строится из адреса, нормализованных параметров запроса и версий
+    моделей cache_models, которые сбрасываются сигналами в api.signals.
+    Списки, отсортированные по volatile_ordering_fields (полям, которые
+    меняются через update() без сигналов), не кешируются.
+    """
+
+    cache_models = ()
+    volatile_ordering_fields = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if (
+            request.user.is_authenticated or not self.cache_models
+            or ordered_by(request, self.volatile_ordering_fields)
+        ):
+            return handler(request, *args, **kwargs)
+
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200 and isinstance(response, Response):
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+
+    def get_cache_key(self, request):
+        params = sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+        )
+        versions = '-'.join(map(str, get_versions(
+            [model_version_key(model) for model in self.cache_models]
+        )))
+        raw_key = f'{request.build_absolute_uri(request.path)}|{params}'
+        return f'response:{versions}:{md5(raw_key.encode()).hexdigest()}'
+
+
+class ConditionalGetMixin:
+    """Ответ 304 на list и retrieve без обращения к сериализаторам.
+
+    Валидаторы строятся из версий моделей cache_models, версии данных
+    текущего пользователя и, для retrieve, поля last_modified_field
+    объекта. Last-Modified равен времени последнего
+    изменения любой из этих частей. Для сортировки по
+    volatile_ordering_fields валидаторы не строятся.
+    """
+
+    cache_models = ()
+    last_modified_field = None
+    volatile_ordering_fields = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_conditional_response(self, handler, request, *args, **kwargs):
+        if ordered_by(request, self.volatile_ordering_fields):
+            return handler(request, *args, **kwargs)
+        validators = self.get_validators(request)
+        if validators is None:
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def get_validators(self, request):
+        keys = [model_version_key(model) for model in self.cache_models]
+        if request.user.is_authenticated:
+            keys.append(user_version_key(request.user.pk))
+        versions = get_versions(keys)
+        changed_at = [version / 10 ** 9 for version in versions]
+
+        if self.action == 'retrieve' and self.last_modified_field:
+            lookup = self.lookup_url_kwarg or self.lookup_field
+            try:
+                modified = self.get_queryset().model.objects.filter(
+                    **{self.lookup_field: self.kwargs[lookup]}
+                ).values_list(self.last_modified_field, flat=True).first()
+            except (ValueError, TypeError, DjangoValidationError):
+                # Некорректный ключ: ответ 404 вернёт get_object.
+                return None
+            if modified is None:
+                return None
+            changed_at.append(modified.timestamp())
+            versions.append(modified.isoformat())
+
+        raw_etag = (
+            f'{request.build_absolute_uri()}|{request.user.pk}|{versions}'
+        )
+        etag = f'W/"{md5(raw_etag.encode()).hexdigest()}"'
+        return etag, int(max(changed_at, default=0))
+
+
+class SparseFieldsMixin:
+    """Параметры fields и omit: выбор полей ответа.
+
+    Выбранные поля передаются сериализатору аргументом fields, а
+    get_queryset по ним не загружает данные невыбранных полей.
+    """
+
+    sparse_fields_actions = ('list', 'retrieve')
+
+    def get_response_fields(self):
+        """Поля ответа в порядке сериализатора или None, если нужны все."""
+        if self.action not in self.sparse_fields_actions:
+            return None
+        if not hasattr(self, '_response_fields'):
+            self._response_fields = self.parse_response_fields()
+        return self._response_fields
+
+    def parse_response_fields(self):
+        params = self.request.query_params
+        fields = {name for name in params.get('fields', '').split(',') if name}
+        omit = {name for name in params.get('omit', '').split(',') if name}
+        if not fields and not omit:
+            return None
+
+        available = self.get_serializer_class().Meta.fields
+        unknown = (fields | omit) - set(available)
+        if unknown:
+            raise ValidationError({
+                'fields': [f'Неизвестные поля: {", ".join(sorted(unknown))}.']
+            })
+        return tuple(
+            name for name in available
+            if (not fields or name in fields) and name not in omit
+        )
+
+    def response_needs(self, name):
+        fields = self.get_response_fields()
+        return fields is None or name in fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_response_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
@@ -1,5 +1,145 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import OrderingFilter
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api.constants import MAX_PAGE_SIZE
 
 
 class CustomLimitPagination(PageNumberPagination):
+    """Постраничная пагинация с параметром limit.
+
+    Если представление задаёт keyset_ordering, а в запросе передан
+    параметр cursor (в том числе пустой — для первой страницы),
+    используется курсорная пагинация по полям keyset_ordering без
+    COUNT(*) и OFFSET. Сортировка, запрошенная через OrderingFilter,
+    заменяет keyset_ordering и дополняется полем id в направлении её
+    последнего поля. В этом режиме сортировать можно только по полям
+    keyset_ordering_fields представления, для которых есть индексы.
+    """
+
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = bool(
+            getattr(view, 'keyset_ordering', None)
+            and self.is_cursor_request(request)
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.ordering = self.get_keyset_ordering(request, queryset, view)
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.get_seek_filter(position))
+            except (TypeError, ValueError, DjangoValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_keyset_ordering(self, request, queryset, view):
+        requested = next((
+            backend().get_ordering(request, queryset, view)
+            for backend in getattr(view, 'filter_backends', ())
+            if issubclass(backend, OrderingFilter)
+        ), None)
+        if not requested:
+            return view.keyset_ordering
+
+        allowed = getattr(view, 'keyset_ordering_fields', ())
+        unsupported = [
+            name for name in requested if name.lstrip('-') not in allowed
+        ]
+        if unsupported:
+            raise ValidationError({'ordering': [
+                'С параметром cursor нельзя сортировать по полям: '
+                f'{", ".join(unsupported)}.'
+            ]})
+        direction = '-' if requested[-1].startswith('-') else ''
+        return (*requested, f'{direction}id')
+
+    def is_cursor_request(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_seek_filter(self, position):
+        """Условие (a, b) < (x, y) в порядке сортировки keyset_ordering."""
+        seek = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            seek |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return seek
+
+    def encode_cursor(self, obj):
+        position = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            position.append(value)
+        return urlsafe_b64encode(
+            json.dumps(position).encode()
+        ).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(
+                urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            )
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            not isinstance(position, list)
+            or len(position) != len(self.ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+
+class KeysetPagination(CustomLimitPagination):
+    """Только курсорная пагинация по keyset_ordering представления."""
+
+    def is_cursor_request(self, request):
+        return True
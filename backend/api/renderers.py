@@ -0,0 +1,70 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class PassthroughRenderer(BaseRenderer):
+    """Рендерер для представлений, формирующих тело ответа сами.
+
+    Нужен для выбора формата по ?format= и Accept; данные ответов DRF
+    (например, ошибок) отдаются как JSON-текст.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (str, bytes)):
+            return data
+        return json.dumps(data, ensure_ascii=False)
+
+
+class PlainTextRenderer(PassthroughRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(PassthroughRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class JSONTextRenderer(PassthroughRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson.
+
+    Типы, которых нет в JSON (даты, Decimal, ленивые строки), кодирует
+    encoder_class, поэтому ответ совпадает с ответом JSONRenderer.
+    Без orjson и при выводе с отступами работает как JSONRenderer.
+    """
+
+    options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if orjson else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            orjson is None or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        content = orjson.dumps(
+            data, default=self.encoder_class().default, option=self.options
+        )
+        # Как JSONRenderer: эти символы ломают JSON внутри <script>.
+        return content.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace('\u2029'.encode(), b'\\u2029')
@@ -1,16 +1,54 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from djoser.serializers import UserSerializer as DjUserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
+from api.constants import MAX_BULK_RECIPES
+from api.shopping_cart import change_recipe_totals
+from api.utils import change_counter
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingList, Tag)
+                            ShoppingCartIngredient, ShoppingList, Tag)
 from users.models import Subscribe
 
 User = get_user_model()
 
 
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None, если он не задан."""
+    try:
+        recipes_limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return None
+    return recipes_limit if recipes_limit >= 0 else None
+
+
+def get_subscribed_ids(context):
+    """id авторов, на которых подписан пользователь запроса.
+
+    Загружаются одним запросом и хранятся в контексте, общем для
+    вложенных сериализаторов и элементов списка.
+    """
+    if 'subscribed_ids' not in context:
+        request = context.get('request')
+        user = getattr(request, 'user', None)
+        context['subscribed_ids'] = set(
+            Subscribe.objects.filter(user=user).values_list(
+                'subscribed_user_id', flat=True
+            )
+        ) if user and user.is_authenticated else set()
+    return context['subscribed_ids']
+
+
+def get_file_url(file, request):
+    """Адрес файла так же, как его отдаёт ImageField сериализатора."""
+    if not file:
+        return None
+    if request is None:
+        return file.url
+    return request.build_absolute_uri(file.url)
+
+
 class AvatarUserSerializer(serializers.ModelSerializer):
     avatar = Base64ImageField(required=True)
 
@@ -28,15 +66,16 @@ class UserSerializer(DjUserSerializer):
         fields = ('email', 'id', 'username', 'first_name',
                   'last_name', 'is_subscribed', 'avatar')
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     def get_is_subscribed(self, subscribed_user):
-        return bool(
-            self.context.get('request')
-            and self.context.get('request').user.is_authenticated
-            and Subscribe.objects.filter(
-                user=self.context.get('request').user,
-                subscribed_user=subscribed_user
-            ).exists()
-        )
+        if hasattr(subscribed_user, 'is_subscribed'):
+            return subscribed_user.is_subscribed
+        return subscribed_user.pk in get_subscribed_ids(self.context)
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -60,10 +99,21 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class CreateRecipeIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
+class ShoppingCartIngredientSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
     )
+    amount = serializers.IntegerField(source='total_amount')
+
+    class Meta:
+        model = ShoppingCartIngredient
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class CreateRecipeIngredientSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField()
 
     class Meta:
         model = RecipeIngredient
@@ -81,9 +131,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     image = Base64ImageField(required=True, allow_null=True)
     text = serializers.CharField(source='description')
     author = UserSerializer(read_only=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all()
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     ingredients = CreateRecipeIngredientSerializer(
         many=True, source='recipeingredients'
     )
@@ -125,35 +173,101 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 'Теги не должны повторяться.'
             )
 
+        errors = {}
+        missing_ingredients = self.get_missing_ids(Ingredient, ingredient_ids)
+        if missing_ingredients:
+            errors['ingredients'] = (
+                f'Ингредиенты не существуют: {missing_ingredients}.'
+            )
+        missing_tags = self.get_missing_ids(Tag, tags)
+        if missing_tags:
+            errors['tags'] = f'Теги не существуют: {missing_tags}.'
+        if errors:
+            raise serializers.ValidationError(errors)
+
         return data
 
+    @staticmethod
+    def get_missing_ids(model, ids):
+        """Идентификаторы из ids, для которых нет записей model."""
+        existing = set(
+            model.objects.filter(pk__in=ids).values_list('pk', flat=True)
+        )
+        return ', '.join(str(pk) for pk in ids if pk not in existing)
+
+    @transaction.atomic
     def create(self, validated_data):
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('recipeingredients')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags_data)
         self.create_ingredients(recipe, ingredients_data)
+        change_counter(User, recipe.author_id, 'recipes_count', 1)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('recipeingredients')
-        instance = super().update(instance, validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Счётчики меняются через F(), поэтому сохраняем только поля формы.
+        instance.save(update_fields=(*validated_data, 'updated_at'))
 
-        instance.tags.clear()
         instance.tags.set(tags_data)
-
-        instance.ingredients.clear()
-        self.create_ingredients(instance, ingredients_data)
+        self.update_ingredients(instance, ingredients_data)
 
         return instance
 
+    @staticmethod
+    def update_ingredients(recipe, ingredients_data):
+        """Изменяет только добавленные, удалённые и изменённые ингредиенты.
+
+        Разница количеств переносится в итоги списков покупок, в которых
+        есть рецепт.
+        """
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipeingredients.all()
+        }
+        amounts = {data['id']: data['amount'] for data in ingredients_data}
+        deltas = {
+            ingredient_id: -recipe_ingredient.amount
+            for ingredient_id, recipe_ingredient in current.items()
+        }
+        for ingredient_id, amount in amounts.items():
+            deltas[ingredient_id] = deltas.get(ingredient_id, 0) + amount
+
+        removed = current.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+
+        changed = []
+        for ingredient_id, recipe_ingredient in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != recipe_ingredient.amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        )
+        change_recipe_totals(recipe.id, deltas)
+
     @staticmethod
     def create_ingredients(recipe, ingredients_data):
         recipe_ingredients = []
 
         for ingredient_data in ingredients_data:
-            ingredient_id = ingredient_data['id'].id
+            ingredient_id = ingredient_data['id']
             amount = ingredient_data['amount']
 
             recipe_ingredients.append(
@@ -167,6 +281,9 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         RecipeIngredient.objects.bulk_create(recipe_ingredients)
 
     def to_representation(self, instance):
+        instance = Recipe.objects.with_related().with_user_flags(
+            self.context['request'].user
+        ).get(pk=instance.pk)
         return RecipeSerializer(instance, context=self.context).data
 
 
@@ -190,57 +307,103 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only_fields = ('author',)
 
     def get_is_favorited(self, recipe):
-        return bool(
-            self.context.get('request')
-            and self.context.get('request').user.is_authenticated
-            and Favorite.objects.filter(
-                user=self.context.get('request').user,
-                recipe=recipe
-            ).exists()
-        )
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
+        return self._user_has_recipe(Favorite, recipe)
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
+        return self._user_has_recipe(ShoppingList, recipe)
+
+    def _user_has_recipe(self, model, recipe):
+        """Проверка связи для рецептов без аннотаций with_user_flags."""
+        request = self.context.get('request')
         return bool(
-            self.context.get('request')
-            and self.context.get('request').user.is_authenticated
-            and ShoppingList.objects.filter(
-                user=self.context.get('request').user,
-                recipe=recipe
-            ).exists()
+            request
+            and request.user.is_authenticated
+            and model.objects.filter(user=request.user, recipe=recipe).exists()
         )
 
 
-class SubscribeCreateSerializer(UserSerializer):
+class RecipeReadSerializer(serializers.BaseSerializer):
+    """Быстрое чтение рецептов: тот же ответ, что у RecipeSerializer.
+
+    Строит словари напрямую, без обхода полей DRF. Рассчитан на рецепты
+    из Recipe.objects.with_related().with_user_flags(user). Аргумент
+    fields ограничивает набор полей ответа.
+    """
 
     class Meta:
-        model = Subscribe
-        fields = ('user', 'subscribed_user')
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Subscribe.objects.all(),
-                fields=('user', 'subscribed_user'),
-                message='Нельзя подписаться дважды.'
-            )
+        model = Recipe
+        fields = (
+            'id', 'tags', 'author', 'ingredients', 'is_favorited',
+            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+        )
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.getters = tuple(
+            (name, getattr(self, f'get_{name}'))
+            for name in fields or self.Meta.fields
+        )
+
+    def to_representation(self, recipe):
+        return {name: getter(recipe) for name, getter in self.getters}
+
+    def get_id(self, recipe):
+        return recipe.id
+
+    def get_tags(self, recipe):
+        return [
+            {'id': tag.id, 'name': tag.name, 'slug': tag.slug}
+            for tag in recipe.tags.all()
         ]
 
-    def validate_subscribed_user(self, subscribed_user):
+    def get_author(self, recipe):
+        author = recipe.author
+        return {
+            'email': author.email,
+            'id': author.id,
+            'username': author.username,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+            'is_subscribed': author.id in get_subscribed_ids(self.context),
+            'avatar': get_file_url(author.avatar, self.context.get('request')),
+        }
+
+    def get_ingredients(self, recipe):
+        return [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.recipeingredients.all()
+        ]
 
-        if self.context.get('request').user == subscribed_user:
-            raise serializers.ValidationError(
-                'Нельзя подписаться на самого себя.'
-            )
+    def get_is_favorited(self, recipe):
+        return recipe.is_favorited
+
+    def get_is_in_shopping_cart(self, recipe):
+        return recipe.is_in_shopping_cart
 
-        return subscribed_user
+    def get_name(self, recipe):
+        return recipe.name
 
-    def to_representation(self, instance):
-        return SubscribeSerializer(
-            instance.subscribed_user, context=self.context
-        ).data
+    def get_image(self, recipe):
+        return get_file_url(recipe.image, self.context.get('request'))
+
+    def get_text(self, recipe):
+        return recipe.description
+
+    def get_cooking_time(self, recipe):
+        return recipe.cooking_time
 
 
 class SubscribeSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -249,65 +412,32 @@ class SubscribeSerializer(UserSerializer):
             'is_subscribed', 'recipes', 'recipes_count', 'avatar',
         )
 
-    def get_recipes_count(self, subscribed_user):
-        return Recipe.objects.filter(author=subscribed_user).count()
-
     def get_recipes(self, subscribed_user):
-        request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
-        recipes = Recipe.objects.filter(author=subscribed_user)
-        if recipes_limit:
-            try:
-                recipes = recipes[:int(recipes_limit)]
-            except ValueError:
-                pass
+        if hasattr(subscribed_user, 'limited_recipes'):
+            recipes = subscribed_user.limited_recipes
+        else:
+            recipes = Recipe.objects.filter(author=subscribed_user)
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
         serializer = RecipeSubscribeSerializer(recipes, many=True)
         return serializer.data
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_RECIPES,
+    )
+
+    def validate_ids(self, ids):
+        return list(dict.fromkeys(ids))
+
+
 class RecipeSubscribeSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
-
-
-class FavoriteSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = Favorite
-        fields = ('user', 'recipe')
-
-    def validate(self, data):
-        if Favorite.objects.filter(
-            user=data['user'], recipe=data['recipe']
-        ).exists():
-            raise serializers.ValidationError('Этот рецепт уже в избранном.')
-        return data
-
-    def to_representation(self, instance):
-        return RecipeSubscribeSerializer(
-            instance.recipe, context=self.context
-        ).data
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = ShoppingList
-        fields = ('user', 'recipe')
-
-    def validate(self, data):
-        if ShoppingList.objects.filter(
-            user=data['user'], recipe=data['recipe']
-        ).exists():
-            raise serializers.ValidationError(
-                {'detail': 'Вы уже добавили этот рецепт в список покупок'},
-            )
-        return data
-
-    def to_representation(self, instance):
-        return RecipeSubscribeSerializer(
-            instance.recipe, context=self.context
-        ).data
@@ -0,0 +1,149 @@
+import csv
+import json
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import connection
+
+from api.constants import UNIT_CONVERSIONS
+from api.utils import get_column
+from recipes.models import (RecipeIngredient, ShoppingCartIngredient,
+                            ShoppingList)
+
+
+def get_table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def upsert_totals(select_sql, params, **filters):
+    """Прибавляет к итогам строки (user, ingredient, amount) из select_sql.
+
+    Затронутые строки (по filters) с неположительным итогом удаляются.
+    """
+    table = get_table(ShoppingCartIngredient)
+    user = get_column(ShoppingCartIngredient, 'user')
+    ingredient = get_column(ShoppingCartIngredient, 'ingredient')
+    total = get_column(ShoppingCartIngredient, 'total_amount')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user}, {ingredient}, {total}) '
+            f'{select_sql} '
+            f'ON CONFLICT ({user}, {ingredient}) DO UPDATE '
+            f'SET {total} = {table}.{total} + EXCLUDED.{total}',
+            params,
+        )
+    ShoppingCartIngredient.objects.filter(
+        total_amount__lte=0, **filters
+    ).delete()
+
+
+def change_cart_totals(user_id, recipe_ids, sign=1):
+    """Учитывает добавление (sign=1) или удаление (sign=-1) рецептов
+    из списка покупок пользователя."""
+    if not recipe_ids:
+        return
+    recipe = get_column(RecipeIngredient, 'recipe')
+    ingredient = get_column(RecipeIngredient, 'ingredient')
+    amount = get_column(RecipeIngredient, 'amount')
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    upsert_totals(
+        f'SELECT %s, {ingredient}, %s * SUM({amount}) '
+        f'FROM {get_table(RecipeIngredient)} '
+        f'WHERE {recipe} IN ({placeholders}) GROUP BY {ingredient}',
+        [user_id, sign, *recipe_ids],
+        user_id=user_id,
+    )
+
+
+def change_recipe_totals(recipe_id, deltas):
+    """Применяет изменения количеств {ingredient_id: delta} рецепта
+    к итогам всех пользователей, у которых он в списке покупок."""
+    deltas = [(pk, delta) for pk, delta in deltas.items() if delta]
+    if not deltas:
+        return
+    values = ', '.join(['(%s, %s)'] * len(deltas))
+    upsert_totals(
+        f'SELECT cart.{get_column(ShoppingList, "user")}, '
+        'delta.column1, delta.column2 '
+        f'FROM {get_table(ShoppingList)} cart '
+        f'CROSS JOIN (VALUES {values}) AS delta '
+        f'WHERE cart.{get_column(ShoppingList, "recipe")} = %s',
+        [value for pair in deltas for value in pair] + [recipe_id],
+        ingredient_id__in=[pk for pk, _ in deltas],
+    )
+
+
+def rebuild_cart_totals():
+    """Пересчитывает итоги всех списков покупок с нуля."""
+    ShoppingCartIngredient.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {get_table(ShoppingCartIngredient)} '
+            f'({get_column(ShoppingCartIngredient, "user")}, '
+            f'{get_column(ShoppingCartIngredient, "ingredient")}, '
+            f'{get_column(ShoppingCartIngredient, "total_amount")}) '
+            f'SELECT cart.{get_column(ShoppingList, "user")}, '
+            f'item.{get_column(RecipeIngredient, "ingredient")}, '
+            f'SUM(item.{get_column(RecipeIngredient, "amount")}) '
+            f'FROM {get_table(ShoppingList)} cart '
+            f'JOIN {get_table(RecipeIngredient)} item '
+            f'ON item.{get_column(RecipeIngredient, "recipe")} = '
+            f'cart.{get_column(ShoppingList, "recipe")} '
+            f'GROUP BY cart.{get_column(ShoppingList, "user")}, '
+            f'item.{get_column(RecipeIngredient, "ingredient")}'
+        )
+        return cursor.rowcount
+
+
+def merge_units(rows):
+    """Объединяет итоги ингредиента в совместимых единицах (г и кг и т.п.).
+
+    rows — кортежи (name, measurement_unit, amount), упорядоченные по name.
+    Если единица у ингредиента одна, она не меняется.
+    """
+    for name, group in groupby(rows, key=itemgetter(0)):
+        totals = {}
+        for _, unit, amount in group:
+            base_unit, factor = UNIT_CONVERSIONS.get(unit, (unit, 1))
+            totals.setdefault(base_unit, []).append((unit, amount, factor))
+        for base_unit, items in totals.items():
+            if len(items) == 1:
+                unit, amount, _ = items[0]
+                yield name, unit, amount
+            else:
+                yield name, base_unit, sum(
+                    amount * factor for _, amount, factor in items
+                )
+
+
+class Echo:
+    """Файлоподобный объект, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def export_txt(rows):
+    for name, unit, amount in rows:
+        yield f'{name} ({unit}) - {amount}\n'
+
+
+def export_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def export_json(rows):
+    separator = '['
+    for name, unit, amount in rows:
+        yield separator + json.dumps(
+            {'name': name, 'measurement_unit': unit, 'amount': amount},
+            ensure_ascii=False,
+        )
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+EXPORTERS = {'txt': export_txt, 'csv': export_csv, 'json': export_json}
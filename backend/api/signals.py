@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import forget_token
+from api.cache import (bump_version_on_commit, forget_short_link,
+                       model_version_key, user_version_key)
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingList, Tag)
+from recipes.short_links import encode_short_link
+from users.models import Subscribe
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=User)
+def bump_model_version(sender, **kwargs):
+    bump_version_on_commit(model_version_key(sender))
+
+
+@receiver(post_save, sender=User)
+def bump_user_version(sender, update_fields=None, **kwargs):
+    """Вход пользователя меняет только last_login и не влияет на ответы."""
+    if update_fields != frozenset(('last_login',)):
+        bump_version_on_commit(model_version_key(sender))
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_recipe_short_links(sender, instance, **kwargs):
+    forget_short_link(encode_short_link(instance.pk))
+    if instance.short_link:
+        forget_short_link(instance.short_link)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipe_tags_version(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_version_on_commit(model_version_key(Recipe))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_save, sender=Subscribe)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_delete, sender=Subscribe)
+def bump_user_data_version(sender, instance, **kwargs):
+    bump_version_on_commit(user_version_key(instance.user_id))
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    """Изменённый или деактивированный пользователь читается заново."""
+    for key in Token.objects.filter(user=instance).values_list(
+        'key', flat=True
+    ):
+        forget_token(key)
@@ -0,0 +1,462 @@
+import shutil
+import tempfile
+from threading import Barrier, Thread
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.authentication import (USER_FIELDS, get_user_from_snapshot,
+                                token_cache_key)
+from api.benchmarks import PASSWORD, create_recipes, create_user
+from api.constants import MAX_PAGE_SIZE
+from api.serializers import RecipeReadSerializer, RecipeSerializer
+from recipes.models import (Favorite, Ingredient, Recipe,
+                            ShoppingCartIngredient, ShoppingList, Tag)
+from recipes.short_links import MAX_PK, decode_short_link, encode_short_link
+from users.models import Subscribe
+
+User = get_user_model()
+
+IMAGE = (
+    'data:image/gif;base64,'
+    'R0lGODlhAQABAIAAAP///wAAACH5BAEAAAAALAAAAAABAAEAAAICRAEAOw=='
+)
+
+
+@mock.patch('api.views.recipe_counters')
+class RecipeQueryCountTest(TestCase):
+    """Число запросов на чтение рецептов не зависит от размера страницы."""
+
+    LIST_QUERIES = 4
+    LIST_AUTHENTICATED_QUERIES = 5
+    RETRIEVE_QUERIES = 4
+    RETRIEVE_AUTHENTICATED_QUERIES = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author', 'Автор')
+        cls.user = create_user('reader', 'Читатель')
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(5)
+        )
+        cls.recipes = create_recipes(
+            cls.author, 500, Tag.objects.all(), Ingredient.objects.all()
+        )
+        Subscribe.objects.create(user=cls.user, subscribed_user=cls.author)
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = APIClient()
+        self.authorized_client = APIClient()
+        self.authorized_client.force_authenticate(self.user)
+
+    def assert_list_queries(self, client, queries):
+        for limit in (6, 50, 500):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    response = client.get(
+                        '/api/recipes/', {'limit': limit}
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    len(response.data['results']), min(limit, MAX_PAGE_SIZE)
+                )
+
+    def test_list_queries(self, recipe_counters):
+        self.assert_list_queries(self.guest_client, self.LIST_QUERIES)
+
+    def test_list_authenticated_queries(self, recipe_counters):
+        self.assert_list_queries(
+            self.authorized_client, self.LIST_AUTHENTICATED_QUERIES
+        )
+
+    def test_retrieve_queries(self, recipe_counters):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        for client, queries in (
+            (self.guest_client, self.RETRIEVE_QUERIES),
+            (self.authorized_client, self.RETRIEVE_AUTHENTICATED_QUERIES),
+        ):
+            cache.clear()
+            with self.subTest(queries=queries):
+                with self.assertNumQueries(queries):
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['ingredients']), 5)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class RecipeWriteQueryCountTest(TestCase):
+    """Число запросов на запись рецепта не зависит от числа ингредиентов."""
+
+    CREATE_QUERIES = 14
+    UPDATE_QUERIES = 19
+    SIZES = (3, 30)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author', 'Автор')
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(max(cls.SIZES) + 1)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.tags = list(Tag.objects.values_list('pk', flat=True))
+        self.ingredients = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+        )
+
+    def get_data(self, ingredients, amount):
+        return {
+            'tags': self.tags,
+            'ingredients': [
+                {'id': ingredient, 'amount': amount}
+                for ingredient in ingredients
+            ],
+            'name': 'Рецепт',
+            'image': IMAGE,
+            'text': 'Описание',
+            'cooking_time': 10,
+        }
+
+    def test_create_queries(self):
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                data = self.get_data(self.ingredients[:size], 5)
+                with self.assertNumQueries(self.CREATE_QUERIES):
+                    response = self.client.post(
+                        '/api/recipes/', data, format='json'
+                    )
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(len(response.data['ingredients']), size)
+
+    def test_update_queries(self):
+        """Один ингредиент удаляется, остальные меняются, один добавляется;
+        рецепт лежит в списке покупок, поэтому меняются и его итоги."""
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                response = self.client.post(
+                    '/api/recipes/',
+                    self.get_data(self.ingredients[:size], 5),
+                    format='json',
+                )
+                pk = response.data['id']
+                ShoppingList.objects.create(user=self.author, recipe_id=pk)
+                data = self.get_data(self.ingredients[1:size + 1], 7)
+                del data['image']
+                with self.assertNumQueries(self.UPDATE_QUERIES):
+                    response = self.client.patch(
+                        f'/api/recipes/{pk}/', data, format='json'
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['ingredients']), size)
+
+
+class RecipeReadSerializerParityTest(TestCase):
+    """RecipeReadSerializer отдаёт то же, что RecipeSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader', 'Читатель')
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+        Tag.objects.create(name='Обед', slug='lunch')
+        Ingredient.objects.create(name='Мука', measurement_unit='г')
+        Ingredient.objects.create(name='Молоко', measurement_unit='мл')
+        for number, avatar in enumerate(('users/avatar.png', '')):
+            author = create_user(f'author{number}', 'Автор', avatar=avatar)
+            create_recipes(
+                author, 3, Tag.objects.all()[:number + 1],
+                Ingredient.objects.all(),
+            )
+            if not number:
+                Subscribe.objects.create(user=cls.user, subscribed_user=author)
+        recipes = Recipe.objects.all()
+        Favorite.objects.create(user=cls.user, recipe=recipes[0])
+        ShoppingList.objects.create(user=cls.user, recipe=recipes[1])
+
+    def serialize(self, serializer_class, user):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        recipes = Recipe.objects.with_related().with_user_flags(user)
+        return serializer_class(
+            recipes, many=True, context={'request': request}
+        ).data
+
+    def test_parity(self):
+        for user in (self.user, AnonymousUser()):
+            expected = self.serialize(RecipeSerializer, user)
+            actual = self.serialize(RecipeReadSerializer, user)
+            self.assertEqual(len(actual), len(expected))
+            for actual_recipe, expected_recipe in zip(actual, expected):
+                self.assertEqual(list(actual_recipe), list(expected_recipe))
+                for field, value in expected_recipe.items():
+                    with self.subTest(
+                        user=user, recipe=expected_recipe['id'], field=field
+                    ):
+                        self.assertEqual(actual_recipe[field], value)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ShoppingCartTotalsTest(TestCase):
+    """Итоги списков покупок совпадают с суммой ингредиентов рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author', 'Автор')
+        cls.user = create_user('reader', 'Читатель')
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(6)
+        )
+        cls.ingredients = list(Ingredient.objects.order_by('pk'))
+        cls.recipes = create_recipes(
+            cls.author, 3, Tag.objects.all(), cls.ingredients[:4]
+        )
+        User.objects.filter(pk=cls.author.pk).update(
+            recipes_count=len(cls.recipes)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+        self.user_client = APIClient()
+        self.user_client.force_authenticate(self.user)
+
+    def assert_totals(self):
+        expected = ShoppingList.objects.filter(
+            recipe__recipeingredients__isnull=False
+        ).values_list(
+            'user', F('recipe__recipeingredients__ingredient')
+        ).annotate(total=Sum('recipe__recipeingredients__amount'))
+        self.assertEqual(
+            set(ShoppingCartIngredient.objects.values_list(
+                'user', 'ingredient', 'total_amount'
+            )),
+            set(expected),
+        )
+
+    def test_totals(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        for client, url, data in (
+            (self.user_client, f'/api/recipes/{first}/shopping_cart/', None),
+            (self.author_client, '/api/recipes/shopping_cart/',
+             {'ids': [first, second, third]}),
+            (self.user_client, '/api/recipes/shopping_cart/',
+             {'ids': [second, third]}),
+        ):
+            with self.subTest(url=url, data=data):
+                response = client.post(url, data, format='json')
+                self.assertIn(response.status_code, (200, 201))
+                self.assert_totals()
+
+        with self.subTest('patch'):
+            response = self.author_client.patch(
+                f'/api/recipes/{first}/',
+                {
+                    'tags': list(Tag.objects.values_list('pk', flat=True)),
+                    'ingredients': [
+                        {'id': ingredient.pk, 'amount': amount}
+                        for ingredient, amount in zip(
+                            self.ingredients[2:], (5, 7, 1, 3)
+                        )
+                    ],
+                    'name': 'Рецепт',
+                    'text': 'Описание',
+                    'cooking_time': 10,
+                },
+                format='json',
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assert_totals()
+
+        with self.subTest('bulk remove'):
+            response = self.user_client.delete(
+                '/api/recipes/shopping_cart/',
+                {'ids': [first, second]}, format='json',
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assert_totals()
+
+        with self.subTest('delete'):
+            response = self.author_client.delete(f'/api/recipes/{third}/')
+            self.assertEqual(response.status_code, 204)
+            self.assert_totals()
+            self.assertTrue(ShoppingCartIngredient.objects.exists())
+
+
+@mock.patch('api.views.recipe_counters')
+class ShortLinkTest(TestCase):
+    """Короткие ссылки есть у рецептов с любым pk."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author', 'Автор')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_codes(self, recipe_counters):
+        for pk in (0, 1, 62 ** 5 - 1, 62 ** 5, 62 ** 7 - 1, 62 ** 7, MAX_PK):
+            with self.subTest(pk=pk):
+                code = encode_short_link(pk)
+                self.assertNotEqual(len(code), 6)
+                self.assertEqual(decode_short_link(code), pk)
+        self.assertEqual(encode_short_link(1), 'qe10K')
+        self.assertEqual(len(encode_short_link(62 ** 5)), 7)
+        self.assertIsNone(decode_short_link('Ab3dE1'))
+
+    def test_redirect(self, recipe_counters):
+        for pk in (1, 62 ** 5):
+            with self.subTest(pk=pk):
+                Recipe.objects.create(
+                    pk=pk, name='Рецепт', description='Описание',
+                    cooking_time=10, image='recipes/test.png',
+                    author=self.author,
+                )
+                response = self.client.get(f'/api/recipes/{pk}/get-link/')
+                self.assertEqual(response.status_code, 200)
+                code = response.data['short-link'].rstrip('/').split('/')[-1]
+                response = self.client.get(f'/s/{code}/')
+                self.assertEqual(response.status_code, 302)
+                self.assertTrue(response['Location'].endswith(
+                    f'/recipes/{pk}/'
+                ))
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': tempfile.mkdtemp(),
+}})
+class TokenCacheTest(TestCase):
+    """В кеше токена лежит снимок пользователя без пароля и счётчиков."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader', 'Читатель', avatar='users/avatar.png')
+        cls.token = Token.objects.create(user=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.CACHES['default']['LOCATION'])
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def test_snapshot(self):
+        response = self.client.get('/api/users/me/')
+        snapshot = cache.get(token_cache_key(self.token.key))
+        self.assertEqual(set(snapshot), set(USER_FIELDS))
+        self.assertEqual(snapshot['avatar'], 'users/avatar.png')
+        self.assertEqual(self.client.get('/api/users/me/').data, response.data)
+
+        User.objects.filter(pk=self.user.pk).update(recipes_count=3)
+        user = get_user_from_snapshot(snapshot)
+        user.save()
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.recipes_count, 3)
+        self.assertTrue(user.check_password(PASSWORD))
+
+
+@skipUnless(
+    connection.vendor == 'postgresql',
+    'SQLite не допускает параллельной записи из нескольких потоков.'
+)
+class ConcurrentToggleTest(TransactionTestCase):
+    """Одновременные добавления одной пары создают одну запись."""
+
+    THREADS = 10
+
+    def setUp(self):
+        self.author = create_user('author', 'Автор')
+        self.user = create_user('reader', 'Читатель')
+        self.recipe = Recipe.objects.create(
+            name='Рецепт', description='Описание', cooking_time=10,
+            image='recipes/test.png', author=self.author,
+        )
+
+    def post_concurrently(self, url):
+        barrier = Barrier(self.THREADS)
+        statuses = []
+
+        def post():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                statuses.append(client.post(url).status_code)
+            finally:
+                connection.close()
+
+        threads = [Thread(target=post) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(statuses)
+
+    def assert_one_created(self, url, queryset):
+        statuses = self.post_concurrently(url)
+        self.assertEqual(statuses, [201] + [400] * (self.THREADS - 1))
+        self.assertEqual(queryset.count(), 1)
+
+    def test_favorite(self):
+        self.assert_one_created(
+            f'/api/recipes/{self.recipe.pk}/favorite/',
+            Favorite.objects.filter(user=self.user, recipe=self.recipe),
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+
+    def test_shopping_cart(self):
+        self.assert_one_created(
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/',
+            ShoppingList.objects.filter(user=self.user, recipe=self.recipe),
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.shopping_cart_count, 1)
+
+    def test_subscribe(self):
+        self.assert_one_created(
+            f'/api/users/{self.author.pk}/subscribe/',
+            Subscribe.objects.filter(
+                user=self.user, subscribed_user=self.author
+            ),
+        )
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
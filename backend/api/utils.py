@@ -0,0 +1,60 @@
+from django.db import connection
+from django.db.models import F
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет поле-счётчик записи на delta."""
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def get_column(model, field):
+    return connection.ops.quote_name(model._meta.get_field(field).column)
+
+
+def insert_ignore_conflicts(model, rows, returning):
+    """Вставляет строки одним INSERT ... ON CONFLICT DO NOTHING.
+
+    rows — список словарей {поле: значение}. Возвращает значения поля
+    returning только для реально вставленных строк.
+    """
+    fields = list(rows[0])
+    columns = ', '.join(get_column(model, field) for field in fields)
+    values = ', '.join(
+        ['({})'.format(', '.join(['%s'] * len(fields)))] * len(rows)
+    )
+    sql = (
+        f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} '
+        f'({columns}) VALUES {values} ON CONFLICT DO NOTHING '
+        f'RETURNING {get_column(model, returning)}'
+    )
+    params = [row[field] for row in rows for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [value for value, in cursor.fetchall()]
+
+
+def delete_returning(model, returning, **filters):
+    """Удаляет строки одним DELETE и возвращает значения поля returning.
+
+    Значение фильтра — скаляр (равенство) или непустой список (IN).
+    """
+    conditions = []
+    params = []
+    for field, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            placeholders = ', '.join(['%s'] * len(value))
+            conditions.append(
+                f'{get_column(model, field)} IN ({placeholders})'
+            )
+            params.extend(value)
+        else:
+            conditions.append(f'{get_column(model, field)} = %s')
+            params.append(value)
+    sql = (
+        f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} '
+        f'WHERE {" AND ".join(conditions)} '
+        f'RETURNING {get_column(model, returning)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [value for value, in cursor.fetchall()]
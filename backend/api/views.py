@@ -1,43 +1,151 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.sites.shortcuts import get_current_site
-from django.db.models import Sum
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Subquery, Value)
+from django.http import (Http404, HttpResponse, HttpResponseRedirect,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjUserViewSet
 from rest_framework import status, viewsets
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
+from api.cache import (bump_version_on_commit, get_short_link_target,
+                       user_version_key)
+from api.catalog import ingredient_catalog
+from api.counters import recipe_counters
 from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import CustomLimitPagination
+from api.json_sql import recipe_document
+from api.mixins import (AnonymousCacheMixin, ConditionalGetMixin,
+                        SparseFieldsMixin)
+from api.pagination import CustomLimitPagination, KeysetPagination
 from api.permissions import IsAuthorOrAuthenticatedOrReadOnly
-from api.serializers import (AvatarUserSerializer, FavoriteSerializer,
-                             IngredientSerializer, RecipeCreateSerializer,
-                             RecipeSerializer, ShoppingCartSerializer,
-                             SubscribeCreateSerializer, SubscribeSerializer,
-                             TagSerializer, UserSerializer)
+from api.renderers import CSVRenderer, JSONTextRenderer, PlainTextRenderer
+from api.serializers import (AvatarUserSerializer, IngredientSerializer,
+                             RecipeCreateSerializer, RecipeIdsSerializer,
+                             RecipeReadSerializer, RecipeSubscribeSerializer,
+                             ShoppingCartIngredientSerializer,
+                             SubscribeSerializer, TagSerializer,
+                             UserSerializer, get_recipes_limit)
+from api.shopping_cart import (EXPORTERS, change_cart_totals,
+                               change_recipe_totals, merge_units)
+from api.utils import change_counter, delete_returning, insert_ignore_conflicts
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingList, Tag)
+                            ShoppingCartIngredient, ShoppingList, Tag)
+from recipes.short_links import decode_short_link, encode_short_link
 from users.models import Subscribe
 
 User = get_user_model()
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    SparseFieldsMixin, ConditionalGetMixin, AnonymousCacheMixin,
+    viewsets.ModelViewSet
+):
     """Администрирование рецептов."""
-    queryset = Recipe.objects.all()
-    filter_backends = (DjangoFilterBackend,)
+    cache_models = (Recipe, Tag, Ingredient, RecipeIngredient, User)
+    last_modified_field = 'updated_at'
+    filter_backends = (DjangoFilterBackend, OrderingFilter)
     filterset_fields = ('tags__slug',)
     filterset_class = RecipeFilter
+    ordering_fields = ('created_at', 'favorites_count', 'shopping_cart_count')
+    volatile_ordering_fields = ('favorites_count', 'shopping_cart_count')
+    keyset_ordering = ('-created_at', '-id')
+    # Поля с индексами (created_at, id) и (favorites_count, id).
+    keyset_ordering_fields = ('created_at', 'favorites_count')
+    sparse_fields_actions = ('list', 'retrieve', 'feed')
+
+    def get_queryset(self):
+        fields = flags = self.get_response_fields()
+        if fields is not None:
+            # Фильтры is_favorited и is_in_shopping_cart используют флаги.
+            flags = (*fields, *self.request.query_params)
+        queryset = Recipe.objects.with_user_flags(self.request.user, flags)
+        if self.action in ('list', 'retrieve', 'feed'):
+            queryset = queryset.with_related(fields)
+            if not self.response_needs('text'):
+                queryset = queryset.defer('description')
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if self.use_json_sql(request):
+            return self.get_conditional_response(
+                self.list_json_sql, request, *args, **kwargs
+            )
+        return super().list(request, *args, **kwargs)
+
+    def use_json_sql(self, request):
+        return (
+            settings.RECIPE_LIST_JSON_SQL
+            and connection.vendor == 'postgresql'
+            and request.accepted_renderer.format == 'json'
+            and not self.paginator.is_cursor_request(request)
+            and self.get_response_fields() is None
+        )
+
+    def list_json_sql(self, request, *args, **kwargs):
+        """Страница списка, документы которой собирает Postgres.
+
+        Страница выбирается по id, затем одним запросом строятся
+        JSON-документы рецептов, и их текст отдаётся как есть.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(
+            queryset.prefetch_related(None).values_list('pk', flat=True)
+        )
+        documents = dict(
+            Recipe.objects.filter(pk__in=page).with_user_flags(request.user)
+            .annotate(document=recipe_document(request))
+            .order_by().values_list('pk', 'document')
+        )
+        head = json.dumps({
+            'count': self.paginator.page.paginator.count,
+            'next': self.paginator.get_next_link(),
+            'previous': self.paginator.get_previous_link(),
+        }, ensure_ascii=False, separators=(',', ':'))
+
+        def stream():
+            yield head[:-1] + ',"results":['
+            yield ','.join(documents[pk] for pk in page if pk in documents)
+            yield ']}'
+
+        return StreamingHttpResponse(stream(), content_type='application/json')
+
+    def retrieve(self, request, *args, **kwargs):
+        """Просмотр рецепта; учитывается и ответ 304 или из кеша."""
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code in (
+            status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+        ):
+            recipe_counters.add('views_count', int(kwargs['pk']))
+        return response
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        ingredients = instance.recipeingredients.values_list(
+            'ingredient_id', 'amount'
+        )
+        change_recipe_totals(instance.pk, {
+            ingredient_id: -amount for ingredient_id, amount in ingredients
+        })
+        instance.delete()
+        change_counter(User, instance.author_id, 'recipes_count', -1)
+
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
-            return RecipeSerializer
+        if self.action in ('list', 'retrieve', 'feed'):
+            return RecipeReadSerializer
         return RecipeCreateSerializer
 
     def get_permissions(self):
@@ -47,113 +155,283 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return (IsAuthorOrAuthenticatedOrReadOnly(),)
         return super().get_permissions()
 
+    def add_recipe(self, request, pk, model, counter, error):
+        """Добавление рецепта в избранное или список покупок.
+
+        Запись выполняется одним INSERT ... ON CONFLICT DO NOTHING, поэтому
+        одновременные повторные запросы не приводят к IntegrityError.
+        """
+        recipe = get_object_or_404(
+            Recipe.objects.only('id', 'name', 'image', 'cooking_time'), pk=pk
+        )
+        try:
+            with transaction.atomic():
+                created = insert_ignore_conflicts(
+                    model, [{'user': request.user.pk, 'recipe': recipe.pk}],
+                    returning='recipe',
+                )
+                if created:
+                    change_counter(Recipe, recipe.pk, counter, 1)
+                    if model is ShoppingList:
+                        change_cart_totals(request.user.pk, created)
+                    bump_version_on_commit(user_version_key(request.user.pk))
+        except IntegrityError:
+            raise NotFound
+        serializer = RecipeSubscribeSerializer(recipe)
+        if created:
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if settings.IDEMPOTENT_TOGGLES:
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        raise ValidationError(error)
+
+    def remove_recipe(self, request, pk, model, counter, error, message):
+        """Удаление рецепта из избранного или списка покупок."""
+        with transaction.atomic():
+            deleted = delete_returning(
+                model, 'recipe', user=request.user.pk, recipe=pk
+            )
+            if deleted:
+                change_counter(Recipe, pk, counter, -1)
+                if model is ShoppingList:
+                    change_cart_totals(request.user.pk, deleted, -1)
+                bump_version_on_commit(user_version_key(request.user.pk))
+
+        if not deleted:
+            if not Recipe.objects.filter(pk=pk).exists():
+                raise NotFound
+            if not settings.IDEMPOTENT_TOGGLES:
+                return Response(
+                    {'detail': error}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+        return Response(
+            {'detail': message}, status=status.HTTP_204_NO_CONTENT
+        )
+
+    def add_recipes(self, request, model, counter):
+        """Добавление нескольких рецептов в избранное или список покупок."""
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        existing = set(
+            Recipe.objects.filter(pk__in=ids).values_list('pk', flat=True)
+        )
+        created = set()
+        if existing:
+            try:
+                with transaction.atomic():
+                    created = set(insert_ignore_conflicts(
+                        model,
+                        [{'user': request.user.pk, 'recipe': pk}
+                         for pk in ids if pk in existing],
+                        returning='recipe',
+                    ))
+                    if created:
+                        Recipe.objects.filter(pk__in=created).update(
+                            **{counter: F(counter) + 1}
+                        )
+                        if model is ShoppingList:
+                            change_cart_totals(request.user.pk, list(created))
+                        bump_version_on_commit(
+                            user_version_key(request.user.pk)
+                        )
+            except IntegrityError:
+                raise NotFound
+        return Response({'results': [
+            {'id': pk, 'status': (
+                'created' if pk in created
+                else 'exists' if pk in existing
+                else 'not_found'
+            )}
+            for pk in ids
+        ]})
+
+    def remove_recipes(self, request, model, counter):
+        """Удаление нескольких рецептов из избранного или списка покупок."""
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        with transaction.atomic():
+            deleted = set(delete_returning(
+                model, 'recipe', user=request.user.pk, recipe=ids
+            ))
+            if deleted:
+                Recipe.objects.filter(pk__in=deleted).update(
+                    **{counter: F(counter) - 1}
+                )
+                if model is ShoppingList:
+                    change_cart_totals(request.user.pk, list(deleted), -1)
+                bump_version_on_commit(user_version_key(request.user.pk))
+        existing = set(
+            Recipe.objects.filter(
+                pk__in=set(ids) - deleted
+            ).values_list('pk', flat=True)
+        ) | deleted
+        return Response({'results': [
+            {'id': pk, 'status': (
+                'deleted' if pk in deleted
+                else 'missing' if pk in existing
+                else 'not_found'
+            )}
+            for pk in ids
+        ]})
+
+    @action(
+        detail=False, methods=('post',), url_path='favorite',
+        url_name='favorite-bulk', permission_classes=(IsAuthenticated,)
+    )
+    def favorite_bulk(self, request):
+        """Добавление списка рецептов {"ids": [...]} в избранное."""
+        return self.add_recipes(request, Favorite, 'favorites_count')
+
+    @favorite_bulk.mapping.delete
+    def remove_favorite_bulk(self, request):
+        """Удаление списка рецептов {"ids": [...]} из избранного."""
+        return self.remove_recipes(request, Favorite, 'favorites_count')
+
+    @action(
+        detail=False, methods=('post',), url_path='shopping_cart',
+        url_name='shopping-cart-bulk', permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_bulk(self, request):
+        """Добавление списка рецептов {"ids": [...]} в список покупок."""
+        return self.add_recipes(request, ShoppingList, 'shopping_cart_count')
+
+    @shopping_cart_bulk.mapping.delete
+    def remove_shopping_cart_bulk(self, request):
+        """Удаление списка рецептов {"ids": [...]} из списка покупок."""
+        return self.remove_recipes(
+            request, ShoppingList, 'shopping_cart_count'
+        )
+
     @action(
         detail=True, methods=('post',),
         permission_classes=(IsAuthenticated,)
     )
     def favorite(self, request, pk):
         """Добавление рецепта в избранное."""
-        recipe = get_object_or_404(Recipe, pk=pk)
-        favorite_data = {'user': request.user.id, 'recipe': recipe.id}
-        serializer = FavoriteSerializer(data=favorite_data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return self.add_recipe(
+            request, pk, Favorite, 'favorites_count',
+            {api_settings.NON_FIELD_ERRORS_KEY: [
+                'Этот рецепт уже в избранном.'
+            ]},
+        )
 
     @favorite.mapping.delete
     def remove_favorite(self, request, pk=None):
         """Удаление рецепта из избранного."""
-        recipe = get_object_or_404(Recipe, pk=pk)
-        deleted_count, _ = Favorite.objects.filter(
-            user=request.user, recipe=recipe
-        ).delete()
-
-        if not deleted_count:
-            return Response(
-                {'detail': 'Этого рецепта нет в избранном.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        return Response(
-            {'detail': 'Вы удалили рецепт из избранного.'},
-            status=status.HTTP_204_NO_CONTENT
+        return self.remove_recipe(
+            request, pk, Favorite, 'favorites_count',
+            'Этого рецепта нет в избранном.',
+            'Вы удалили рецепт из избранного.',
         )
 
     @action(detail=True, methods=('post',),
             permission_classes=(IsAuthenticated,))
     def shopping_cart(self, request, pk):
         """Добавление рецепта в список покупок."""
-        recipe = get_object_or_404(Recipe, pk=pk)
-        shopping_cart_data = {'user': request.user.id, 'recipe': recipe.id}
-        serializer = ShoppingCartSerializer(data=shopping_cart_data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return self.add_recipe(
+            request, pk, ShoppingList, 'shopping_cart_count',
+            {'detail': ['Вы уже добавили этот рецепт в список покупок']},
+        )
 
     @shopping_cart.mapping.delete
     def remove_shopping_cart(self, request, pk=None):
         """Удаление рецепта из списка покупок."""
-        recipe = get_object_or_404(Recipe, pk=pk)
-        deleted_count, _ = ShoppingList.objects.filter(
-            user=request.user, recipe=recipe
-        ).delete()
-
-        if not deleted_count:
-            return Response(
-                {'detail': 'Этого рецепта нет в списке покупок.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        return Response(
-            {'detail': 'Вы удалили рецепт из списка покупок.'},
-            status=status.HTTP_204_NO_CONTENT
+        return self.remove_recipe(
+            request, pk, ShoppingList, 'shopping_cart_count',
+            'Этого рецепта нет в списке покупок.',
+            'Вы удалили рецепт из списка покупок.',
         )
 
-    @action(detail=False, permission_classes=[IsAuthenticated])
+    @staticmethod
+    def get_cart_totals(user):
+        return ShoppingCartIngredient.objects.filter(
+            user=user
+        ).order_by('ingredient__name')
+
+    @action(
+        detail=False, permission_classes=[IsAuthenticated],
+        renderer_classes=(PlainTextRenderer, CSVRenderer, JSONTextRenderer),
+    )
     def download_shopping_cart(self, request):
-        """Скачать список покупок текущего пользователя в текстовом формате."""
-        user = request.user
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_lists__user=user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(
-            total_amount=Sum('amount')
+        """Скачать список покупок текущего пользователя.
+
+        Формат (txt, csv или json) выбирается параметром format или
+        заголовком Accept. Файл отдаётся потоком по мере чтения итогов.
+        """
+        renderer = request.accepted_renderer
+        rows = merge_units(self.get_cart_totals(request.user).values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+        ).iterator())
+        response = StreamingHttpResponse(
+            EXPORTERS[renderer.format](rows),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
         )
-        shopping_list_text = ''
-
-        for ingredient in ingredients:
-            shopping_list_text += (
-                f'{ingredient["ingredient__name"]} '
-                f'({ingredient["ingredient__measurement_unit"]}) - '
-                f'{ingredient["total_amount"]}\n'
-            )
-
-        response = HttpResponse(shopping_list_text, content_type='text/plain')
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.txt"'
+            f'attachment; filename="shopping_cart.{renderer.format}"'
         )
         return response
 
+    @action(
+        detail=False, url_path='shopping_cart/summary',
+        url_name='shopping-cart-summary',
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_summary(self, request):
+        """Суммарные количества ингредиентов списка покупок."""
+        serializer = ShoppingCartIngredientSerializer(
+            self.get_cart_totals(request.user).select_related('ingredient'),
+            many=True,
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=KeysetPagination,
+    )
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь."""
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            author__in=Subscribe.objects.filter(
+                user=request.user
+            ).values('subscribed_user')
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, url_path='get-link')
     def get_link(self, request, pk):
         """Получение короткой ссылки."""
-        recipe = get_object_or_404(Recipe, id=pk)
-        short_link = f'http://{request.get_host()}/s/{recipe.short_link}/'
+        try:
+            pk = int(pk)
+        except ValueError:
+            raise NotFound
+        if not Recipe.objects.filter(pk=pk).exists():
+            raise NotFound
+        code = encode_short_link(pk)
+        short_link = f'http://{request.get_host()}/s/{code}/'
         return Response({'short-link': short_link}, status=status.HTTP_200_OK)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(
+    ConditionalGetMixin, AnonymousCacheMixin, viewsets.ReadOnlyModelViewSet
+):
     """Теги."""
+    cache_models = (Tag,)
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (AllowAny,)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    ConditionalGetMixin, AnonymousCacheMixin, viewsets.ReadOnlyModelViewSet
+):
     """Получение ингредиентов."""
+    cache_models = (Ingredient,)
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
@@ -161,13 +439,48 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        """Поиск по префиксу названия в каталоге из памяти воркера."""
+        return self.get_conditional_response(self.search_catalog, request)
 
-class UserViewSet(DjUserViewSet):
+    def search_catalog(self, request):
+        return HttpResponse(
+            ingredient_catalog.search(request.query_params.get('name')),
+            content_type='application/json',
+        )
+
+
+class UserViewSet(SparseFieldsMixin, DjUserViewSet):
     """Администрирование пользователей."""
     queryset = User.objects.all()
     permission_classes = [AllowAny]
     pagination_class = CustomLimitPagination
     serializer_class = UserSerializer
+    keyset_ordering = None
+    sparse_fields_actions = ('list', 'retrieve', 'me', 'subscriptions')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        fields = self.get_response_fields()
+        if fields is not None:
+            queryset = queryset.only(
+                'id', *(name for name in fields if name != 'is_subscribed')
+            )
+        user = self.request.user
+        if user.is_authenticated and self.response_needs('is_subscribed'):
+            queryset = queryset.annotate(is_subscribed=Exists(
+                Subscribe.objects.filter(
+                    user=user, subscribed_user=OuterRef('pk')
+                )
+            ))
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'subscriptions':
+            return SubscribeSerializer
+        return super().get_serializer_class()
 
     @action(
         detail=False,
@@ -207,30 +520,62 @@ class UserViewSet(DjUserViewSet):
     def subscribe(self, request, **kwargs):
         """Подписка."""
         subscribed_user = get_object_or_404(User, id=self.kwargs.get('id'))
-        subscribe_data = {
-            'user': request.user.id, 'subscribed_user': subscribed_user.id
-        }
-        serializer = SubscribeCreateSerializer(
-            data=subscribe_data, context={'request': request}
+        if subscribed_user == request.user:
+            raise ValidationError(
+                {'subscribed_user': ['Нельзя подписаться на самого себя.']}
+            )
+        try:
+            with transaction.atomic():
+                created = insert_ignore_conflicts(
+                    Subscribe,
+                    [{
+                        'user': request.user.pk,
+                        'subscribed_user': subscribed_user.pk,
+                    }],
+                    returning='subscribed_user',
+                )
+                if created:
+                    change_counter(
+                        User, subscribed_user.pk, 'followers_count', 1
+                    )
+                    bump_version_on_commit(user_version_key(request.user.pk))
+        except IntegrityError:
+            raise NotFound
+
+        if not created and not settings.IDEMPOTENT_TOGGLES:
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                'Нельзя подписаться дважды.'
+            ]})
+        subscribed_user.is_subscribed = True
+        serializer = SubscribeSerializer(
+            subscribed_user, context={'request': request}
+        )
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
     def remove_subscribe(self, request, **kwargs):
-        subscribed_user = get_object_or_404(User, id=self.kwargs.get('id'))
-        subscription = Subscribe.objects.filter(
-            user=request.user.id, subscribed_user=subscribed_user.id
-        ).first()
-
-        if not subscription:
-            return Response(
-                {'detail': 'Вы не подписаны на этого пользователя.'},
-                status=status.HTTP_400_BAD_REQUEST
+        subscribed_user_id = self.kwargs.get('id')
+        with transaction.atomic():
+            deleted = delete_returning(
+                Subscribe, 'subscribed_user',
+                user=request.user.pk, subscribed_user=subscribed_user_id,
             )
+            if deleted:
+                change_counter(User, deleted[0], 'followers_count', -1)
+                bump_version_on_commit(user_version_key(request.user.pk))
+
+        if not deleted:
+            if not User.objects.filter(id=subscribed_user_id).exists():
+                raise NotFound
+            if not settings.IDEMPOTENT_TOGGLES:
+                return Response(
+                    {'detail': 'Вы не подписаны на этого пользователя.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        subscription.delete()
         return Response(
             {'detail': 'Вы отписались от пользователя.'},
             status=status.HTTP_204_NO_CONTENT
@@ -239,25 +584,52 @@ class UserViewSet(DjUserViewSet):
     @action(
         detail=False,
         methods=['get'],
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        keyset_ordering=('subscription_id',),
     )
     def subscriptions(self, request):
         """Метод для получения подписок текущего пользователя."""
-        subscriptions = Subscribe.objects.filter(user=self.request.user)
-        following_users = [sub.subscribed_user for sub in subscriptions]
+        following_users = User.objects.filter(
+            subscriptions__user=request.user
+        ).annotate(
+            subscription_id=F('subscriptions__id'),
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).order_by('subscription_id')
+        if self.response_needs('recipes'):
+            recipes = Recipe.objects.only(
+                'id', 'name', 'image', 'cooking_time', 'author_id'
+            )
+            recipes_limit = get_recipes_limit(request)
+            if recipes_limit is not None:
+                recipes = recipes.filter(pk__in=Subquery(
+                    Recipe.objects.filter(
+                        author=OuterRef('author')
+                    ).values('pk')[:recipes_limit]
+                ))
+            following_users = following_users.prefetch_related(Prefetch(
+                'recipes', queryset=recipes, to_attr='limited_recipes'
+            ))
         pages = self.paginate_queryset(following_users)
-        serializer = SubscribeSerializer(
-            pages, many=True, context={'request': request}
-        )
+        serializer = self.get_serializer(pages, many=True)
 
         return self.get_paginated_response(serializer.data)
 
 
-@api_view(['GET'])
-@permission_classes([AllowAny])
+def get_short_link_recipe_id(code):
+    pk = decode_short_link(code)
+    filters = {'short_link': code} if pk is None else {'pk': pk}
+    return Recipe.objects.filter(**filters).values_list(
+        'id', flat=True
+    ).first()
+
+
+@require_GET
 def redirect_short_link(request, short_url):
     """Метод для редиректа с короткой ссылки."""
-    recipe = get_object_or_404(Recipe, short_link=short_url)
-    host = get_current_site(request)
-    redirect_url = f'http://{host.domain}/recipes/{recipe.id}/'
-    return HttpResponseRedirect(redirect_url)
+    recipe_id = get_short_link_target(short_url, get_short_link_recipe_id)
+    if recipe_id is None:
+        raise Http404
+    recipe_counters.add('link_clicks_count', recipe_id)
+    return HttpResponseRedirect(
+        f'http://{request.get_host()}/recipes/{recipe_id}/'
+    )
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -85,6 +86,49 @@ DATABASES = {
     }
 }
 
+# Cache
+# Воркеры gunicorn должны разделять кеш (файловый или Redis), иначе версии
+# моделей сбрасываются только в воркере, выполнившем запись.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+
+# Повторное добавление в избранное, список покупок или подписки отвечает
+# 200 вместо 400, повторное удаление — 204.
+IDEMPOTENT_TOGGLES = os.getenv('IDEMPOTENT_TOGGLES', 'False') == 'True'
+
+# Кеш коротких ссылок в памяти воркера. При удалении рецепта он
+# очищается только в воркере, выполнившем удаление, в остальных — по TTL.
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 10000))
+SHORT_LINK_CACHE_TIMEOUT = int(os.getenv('SHORT_LINK_CACHE_TIMEOUT', 300))
+
+# Просмотры рецептов и переходы по ссылкам копятся в памяти воркера и
+# записываются в базу раз в COUNTERS_FLUSH_INTERVAL секунд или после
+# COUNTERS_BUFFER_SIZE приращений.
+COUNTERS_FLUSH_INTERVAL = int(os.getenv('COUNTERS_FLUSH_INTERVAL', 10))
+COUNTERS_BUFFER_SIZE = int(os.getenv('COUNTERS_BUFFER_SIZE', 1000))
+
+# Список рецептов с JSON-документами, собранными в Postgres
+# (json_build_object/json_agg). В SQLite всегда используется ORM.
+RECIPE_LIST_JSON_SQL = os.getenv('RECIPE_LIST_JSON_SQL', 'False') == 'True'
+
+# Время жизни пользователя в кеше CachedTokenAuthentication. Кеш
+# используется только с общим для воркеров CACHE_BACKEND (не LocMemCache).
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 300))
+
+# Сжатие ответов api.middleware.CompressionMiddleware: минимальный размер
+# ответа в байтах и качество brotli (0-11, выше — медленнее).
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -137,7 +181,16 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomLimitPagination',
     'PAGE_SIZE': 6,
@@ -2,7 +2,7 @@ from django.contrib import admin
 
 from recipes.constants import ADMIN_EXTRA_FIELDS, ADMIN_MIN_NUM
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingList, Tag)
+                            ShoppingCartIngredient, ShoppingList, Tag)
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -37,7 +37,8 @@ class IngredientAdmin(admin.ModelAdmin):
 
 class RecipeAdmin(admin.ModelAdmin):
     list_display = (
-        'id', 'name', 'author',
+        'id', 'name', 'author', 'favorites_count', 'shopping_cart_count',
+        'views_count', 'link_clicks_count',
     )
     list_display_links = ('name',)
     search_fields = ('name', 'author__username',)
@@ -47,7 +48,7 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @admin.display(description='Добавлено в избранное раз')
     def recipe_in_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 class RecipeIngredientAdmin(admin.ModelAdmin):
@@ -61,6 +62,12 @@ class ShoppingListAdmin(admin.ModelAdmin):
     list_display_links = ('user',)
 
 
+class ShoppingCartIngredientAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'ingredient', 'total_amount',)
+    list_display_links = ('user',)
+    readonly_fields = ('user', 'ingredient', 'total_amount',)
+
+
 class TagAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'slug',)
     list_editable = ('name', 'slug',)
@@ -72,4 +79,5 @@ admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(RecipeIngredient, RecipeIngredientAdmin)
 admin.site.register(ShoppingList, ShoppingListAdmin)
+admin.site.register(ShoppingCartIngredient, ShoppingCartIngredientAdmin)
 admin.site.register(Tag, TagAdmin)
@@ -2,3 +2,10 @@ ADMIN_EXTRA_FIELDS = 1
 ADMIN_MIN_NUM = 1
 MAX_AMOUNT = MAX_COOKING_TIME = 32000
 MIN_AMOUNT = MIN_COOKING_TIME = 1
+SHORT_LINK_ALPHABET = (
+    '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+)
+SHORT_LINK_LENGTH = 5
+# Взаимно просто с 62, поэтому перестановка обратима при любой длине кода.
+SHORT_LINK_MULTIPLIER = 387420489
+SHORT_LINK_OFFSET = 104729
@@ -1,10 +1,8 @@
-import random
-import string
-
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from django.db.models import UniqueConstraint
+from django.db.models import (BooleanField, Exists, OuterRef, UniqueConstraint,
+                              Value)
 
 from api.constants import (MAX_LENGTH_INGREDIENT_NAME,
                            MAX_LENGTH_MEASUREMENT_UNIT, MAX_LENGTH_RECIPE_NAME,
@@ -15,6 +13,55 @@ from recipes.constants import (MAX_AMOUNT, MAX_COOKING_TIME, MIN_AMOUNT,
 User = get_user_model()
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов рецептов."""
+
+    def with_related(self, fields=None):
+        """Загружает автора, теги и ингредиенты для сериализации.
+
+        Если задан список полей ответа fields, загружаются только нужные.
+        """
+        queryset = self
+        if fields is None or 'author' in fields:
+            queryset = queryset.select_related('author')
+        if fields is None or 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if fields is None or 'ingredients' in fields:
+            queryset = queryset.prefetch_related(models.Prefetch(
+                'recipeingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ),
+            ))
+        return queryset
+
+    def with_user_flags(self, user, fields=None):
+        """Аннотирует флаги is_favorited и is_in_shopping_cart.
+
+        Если задан список fields, аннотируются только флаги из него.
+        """
+        if not user.is_authenticated:
+            flags = {
+                'is_favorited': Value(False, output_field=BooleanField()),
+                'is_in_shopping_cart': Value(
+                    False, output_field=BooleanField()
+                ),
+            }
+        else:
+            flags = {
+                'is_favorited': Exists(
+                    Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+                ),
+                'is_in_shopping_cart': Exists(ShoppingList.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+            }
+        return self.annotate(**{
+            name: flag for name, flag in flags.items()
+            if fields is None or name in fields
+        })
+
+
 class Recipe(models.Model):
     """Модель рецепта."""
 
@@ -61,38 +108,60 @@ class Recipe(models.Model):
         verbose_name='Теги',
         related_name='recipes'
     )
+    # Случайные коды старых ссылок. Новые ссылки вычисляются из pk
+    # (recipes.short_links), а этот столбец нужен, чтобы старые работали.
     short_link = models.CharField(
         max_length=MAX_LENGTH_SHORT_LINK,
         unique=True,
         blank=True,
         null=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлено в избранное раз',
+        default=0,
+        editable=False,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='Добавлено в список покупок раз',
+        default=0,
+        editable=False,
+    )
+    views_count = models.PositiveIntegerField(
+        verbose_name='Просмотров',
+        default=0,
+        editable=False,
+    )
+    link_clicks_count = models.PositiveIntegerField(
+        verbose_name='Переходов по короткой ссылке',
+        default=0,
+        editable=False,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-created_at',)
+        ordering = ('-created_at', '-id')
+        indexes = (
+            models.Index(
+                fields=('-created_at', '-id'), name='recipe_created_at_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-created_at', '-id'),
+                name='recipe_author_created_at_idx',
+            ),
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_favorites_count_idx',
+            ),
+        )
 
     def __str__(self):
         return self.name
 
-    def save(self, *args, **kwargs):
-        """Сохраняет рецепт, генерируя короткую ссылку при необходимости."""
-        if not self.short_link:
-            self.short_link = self.generate_unique_short_url()
-        super().save(*args, **kwargs)
-
-    def generate_unique_short_url(self, length=MAX_LENGTH_SHORT_LINK):
-        """Генератор коротких ссылок."""
-        while True:
-            short_link = ''.join(
-                random.choices(string.ascii_letters + string.digits, k=length)
-            )
-            if not Recipe.objects.filter(short_link=short_link).exists():
-                return short_link
-
 
 class Tag(models.Model):
     """Модель тега."""
@@ -238,3 +307,35 @@ class ShoppingList(models.Model):
                 name='unique_user_recipe',
             )
         ]
+
+
+class ShoppingCartIngredient(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Поддерживается приращениями при изменении списка покупок и состава
+    рецептов из него.
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+    )
+    total_amount = models.IntegerField(verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списка покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_user_ingredient',
+            )
+        ]
@@ -0,0 +1,68 @@
+from api.constants import MAX_LENGTH_SHORT_LINK
+from recipes.constants import (SHORT_LINK_ALPHABET, SHORT_LINK_LENGTH,
+                               SHORT_LINK_MULTIPLIER, SHORT_LINK_OFFSET)
+
+BASE = len(SHORT_LINK_ALPHABET)
+DIGITS = {char: value for value, char in enumerate(SHORT_LINK_ALPHABET)}
+# Наибольший pk BigAutoField.
+MAX_PK = 2 ** 63 - 1
+
+
+def get_code_length(pk):
+    """Длина кода pk.
+
+    pk меньше BASE ** SHORT_LINK_LENGTH получают SHORT_LINK_LENGTH знаков,
+    остальные — сколько нужно, но больше, чем у старых случайных ссылок
+    (MAX_LENGTH_SHORT_LINK знаков), чтобы с ними не совпадать.
+    """
+    if pk < BASE ** SHORT_LINK_LENGTH:
+        return SHORT_LINK_LENGTH
+    length = MAX_LENGTH_SHORT_LINK + 1
+    while pk >= BASE ** length:
+        length += 1
+    return length
+
+
+INVERSES = {
+    length: pow(SHORT_LINK_MULTIPLIER, -1, BASE ** length)
+    for length in (
+        SHORT_LINK_LENGTH,
+        *range(MAX_LENGTH_SHORT_LINK + 1, get_code_length(MAX_PK) + 1),
+    )
+}
+
+
+def encode_short_link(pk):
+    """Короткий код рецепта: перестановка pk, записанная в base62.
+
+    Перестановка берётся по модулю BASE ** длина кода, а длина зависит
+    только от pk, поэтому коды разных pk не совпадают и проверять
+    уникальность в базе не нужно.
+    """
+    if not 0 <= pk <= MAX_PK:
+        raise ValueError(f'pk must be in range [0, {MAX_PK}].')
+    length = get_code_length(pk)
+    value = (pk * SHORT_LINK_MULTIPLIER + SHORT_LINK_OFFSET) % BASE ** length
+    code = []
+    for _ in range(length):
+        value, digit = divmod(value, BASE)
+        code.append(SHORT_LINK_ALPHABET[digit])
+    return ''.join(reversed(code))
+
+
+def decode_short_link(code):
+    """pk рецепта по короткому коду или None, если код не такого вида."""
+    inverse = INVERSES.get(len(code))
+    if inverse is None:
+        return None
+    value = 0
+    for char in code:
+        if char not in DIGITS:
+            return None
+        value = value * BASE + DIGITS[char]
+    space = BASE ** len(code)
+    pk = (value - SHORT_LINK_OFFSET) * inverse % space
+    # Код длины length — только у pk из её диапазона.
+    if pk > MAX_PK or get_code_length(pk) != len(code):
+        return None
+    return pk